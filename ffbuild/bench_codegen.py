@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import codegen
+
+type BenchCase = dict[str, Any]
+type BenchResult = dict[str, float | int]
+
+HELP = '''
+Benchmark the codegen.py subcommands.
+
+Timings depend on the machine, so the baseline is recorded on the host
+which later runs the comparison, from a known good tree:
+
+    python ffbuild/bench_codegen.py --save
+
+and a change is then checked against it with:
+
+    python ffbuild/bench_codegen.py --baseline
+
+which exits with an error when a case regressed. Both options default
+to ffbuild/bench_codegen_baseline.json.
+'''
+
+SRC_ROOT = Path(__file__).absolute().parent.parent
+DEFAULT_BASELINE = SRC_ROOT / 'ffbuild' / 'bench_codegen_baseline.json'
+
+FILE2C_SIZES = [4 << 10, 256 << 10, 4 << 20, 32 << 20]
+MAKEFILE_LIBS = ['libavcodec', 'libavfilter']
+MAKEFILE_INFLATE_FACTORS = [4, 16]
+PRINT_CONFIG_KEYS = [2000, 10000]
+
+# (source file, struct name, list name) as passed by configure
+COMPONENT_LISTS = [
+    ('libavfilter/allfilters.c', 'FFFilter', 'filter_list'),
+    ('libavcodec/allcodecs.c', 'FFCodec', 'codec_list'),
+    ('libavcodec/parsers.c', 'FFCodecParser', 'parser_list'),
+    ('libavcodec/bitstream_filters.c', 'FFBitStreamFilter', 'bitstream_filters'),
+    ('libavformat/allformats.c', 'FFInputFormat', 'demuxer_list'),
+    ('libavformat/allformats.c', 'FFOutputFormat', 'muxer_list'),
+    ('libavdevice/alldevices.c', 'FFInputFormat', 'indev_list'),
+    ('libavdevice/alldevices.c', 'FFOutputFormat', 'outdev_list'),
+    ('libavformat/protocols.c', 'URLProtocol', 'url_protocols'),
+]
+COMPONENT_DECLARATION_PATTERN = re.compile(r'^extern const (\w+)\s+ff_(\w+);', re.MULTILINE)
+
+# Result fields checked against the baseline, with the regression rule used:
+# timings and memory are noisy and get a relative tolerance, the syscall and
+# stat counts are deterministic for a given tree and must not grow.
+TOLERANT_FIELDS = ['time_median', 'peak_kib']
+EXACT_FIELDS = ['stat_calls', 'open_calls']
+
+io_counters = {'stat_calls': 0, 'open_calls': 0}
+counting = False
+
+
+def audit_hook(event: str, args: tuple) -> None:
+    if counting and event == 'open':
+        io_counters['open_calls'] += 1
+
+
+def read_proc_io() -> dict[str, int]:
+    """Returns the read/write syscall counters of this process, when available."""
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return {}
+    return {'syscr': int(fields['syscr']), 'syscw': int(fields['syscw'])}
+
+
+def measure_io(run: Callable[[], None]) -> BenchResult:
+    """Runs the case once while tracing memory, file opens and stat calls."""
+    global counting
+
+    real_stat = os.stat
+
+    def counting_stat(*args, **kwargs):
+        io_counters['stat_calls'] += 1
+        return real_stat(*args, **kwargs)
+
+    for key in io_counters:
+        io_counters[key] = 0
+    proc_before = read_proc_io()
+    # os.path.exists() and Path.exists() both go through os.stat()
+    os.stat = counting_stat
+    tracemalloc.start()
+    counting = True
+    try:
+        run()
+    finally:
+        counting = False
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.stat = real_stat
+    proc_after = read_proc_io()
+
+    result: BenchResult = {'peak_kib': peak // 1024, **io_counters}
+    for key in proc_after:
+        result[key] = proc_after[key] - proc_before[key]
+    return result
+
+
+def run_case(case: BenchCase, repeat: int) -> BenchResult:
+    timings = []
+    for _ in range(repeat):
+        case['reset']()
+        start = time.perf_counter()
+        case['run']()
+        timings.append(time.perf_counter() - start)
+
+    case['reset']()
+    result: BenchResult = {
+        'time_min': min(timings),
+        'time_median': statistics.median(timings),
+    }
+    result.update(measure_io(case['run']))
+    return result
+
+
+def unlink_outputs(*paths: Path) -> Callable[[], None]:
+    def reset() -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+    return reset
+
+
+def file2c_cases(tmp_dir: Path) -> list[BenchCase]:
+    cases = []
+    rng = random.Random(0)
+    for size in FILE2C_SIZES:
+        input_path = tmp_dir / f'resource_{size}.bin'
+        output_path = tmp_dir / f'resource_{size}.c'
+        input_path.write_bytes(rng.randbytes(size))
+        args = argparse.Namespace(input=str(input_path), output=str(output_path), var_name='resource')
+        cases.append({
+            'name': f'file2c/{size >> 10}KiB',
+            'run': lambda args=args: codegen.cmd_file2c(args),
+            'reset': unlink_outputs(output_path),
+        })
+    return cases
+
+
+def parse_makefile_case(name: str, makefile_path: Path, cur_dir: Path, var_prefix: str) -> BenchCase:
+    def run() -> None:
+        codegen.parse_makefile_logic(makefile_path, cur_dir, var_prefix, {'ARCH': 'x86'}, {}, None)
+    return {'name': name, 'run': run, 'reset': lambda: None}
+
+
+def parse_makefile_cases(tmp_dir: Path) -> list[BenchCase]:
+    cases = []
+    for lib in MAKEFILE_LIBS:
+        makefile_path = SRC_ROOT / lib / 'Makefile'
+        cur_dir = makefile_path.parent
+        var_prefix = lib.upper()
+        cases.append(parse_makefile_case(f'parse_makefile_logic/{lib}', makefile_path, cur_dir, var_prefix))
+
+        # Inflated trees repeat the real Makefile next to links to the real
+        # library files, so every object still resolves to a source file.
+        content = makefile_path.read_text()
+        for factor in MAKEFILE_INFLATE_FACTORS:
+            inflated_dir = tmp_dir / f'{lib}_x{factor}'
+            inflated_dir.mkdir()
+            for entry in cur_dir.iterdir():
+                if entry.name != 'Makefile':
+                    (inflated_dir / entry.name).symlink_to(entry)
+            inflated_path = inflated_dir / 'Makefile'
+            inflated_path.write_text(content * factor)
+            cases.append(parse_makefile_case(f'parse_makefile_logic/{lib}_x{factor}', inflated_path, inflated_dir, var_prefix))
+    return cases
+
+
+def print_config_cases(tmp_dir: Path) -> list[BenchCase]:
+    cases = []
+    for count in PRINT_CONFIG_KEYS:
+        values = ['yes', 'no', '"value"']
+        config_input = ''.join(f'CONFIG_ITEM_{i} {values[i % len(values)]}\n' for i in range(count))
+        outputs = [tmp_dir / f'config_{count}{ext}' for ext in ['.h', '.asm', '.mak', '.texi']]
+        args = argparse.Namespace(prefix='', files=' '.join(str(path) for path in outputs))
+
+        def run(args=args, config_input=config_input) -> None:
+            stdin = sys.stdin
+            sys.stdin = io.StringIO(config_input)
+            try:
+                codegen.cmd_print_config(args)
+            finally:
+                sys.stdin = stdin
+
+        cases.append({
+            'name': f'print_config/{count}_keys',
+            'run': run,
+            'reset': unlink_outputs(*outputs),
+        })
+    return cases
+
+
+def print_enabled_components_cases(tmp_dir: Path) -> list[BenchCase]:
+    cases = []
+    for source, struct_name, name in COMPONENT_LISTS:
+        items = [
+            item
+            for struct, item in COMPONENT_DECLARATION_PATTERN.findall((SRC_ROOT / source).read_text())
+            if struct == struct_name
+        ]
+        output_path = tmp_dir / f'{name}.c'
+        args = argparse.Namespace(file=str(output_path), struct_name=struct_name, name=name, items=' '.join(items))
+        cases.append({
+            'name': f'print_enabled_components/{name}',
+            'run': lambda args=args: codegen.cmd_print_enabled_components(args),
+            'reset': unlink_outputs(output_path),
+        })
+    return cases
+
+
+def find_regressions(results: dict[str, BenchResult], baseline: dict[str, BenchResult], tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        for field in TOLERANT_FIELDS:
+            if field in base and result[field] > base[field] * (1 + tolerance):
+                regressions.append(f'{name}: {field} {base[field]:.6g} -> {result[field]:.6g}')
+        for field in EXACT_FIELDS:
+            if field in base and result[field] > base[field]:
+                regressions.append(f'{name}: {field} {base[field]} -> {result[field]}')
+    return regressions
+
+
+def print_results(results: dict[str, BenchResult]) -> None:
+    print(f'{"case":<48} {"median s":>10} {"min s":>10} {"peak KiB":>10} {"stat":>7} {"open":>6} {"syscr":>7} {"syscw":>7}')
+    for name, r in results.items():
+        print(f'{name:<48} {r["time_median"]:>10.4f} {r["time_min"]:>10.4f} {r["peak_kib"]:>10} '
+              f'{r["stat_calls"]:>7} {r["open_calls"]:>6} {r.get("syscr", "-"):>7} {r.get("syscw", "-"):>7}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=HELP, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', '-k', default='', help='only run the cases whose name contains this string')
+    parser.add_argument('--repeat', '-r', type=int, default=3, help='number of timed runs per case')
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, type=Path,
+                        help='write the results as a JSON baseline to this path')
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE, type=Path,
+                        help='compare the results against a JSON baseline written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative increase of time and memory over the baseline')
+    args = parser.parse_args()
+    save_path = args.save.absolute() if args.save else None
+    baseline_path = args.baseline.absolute() if args.baseline else None
+
+    # The include directives of the Makefiles are resolved from the source root,
+    # as when generate_cmakes.sh runs codegen.py.
+    os.chdir(SRC_ROOT)
+    sys.addaudithook(audit_hook)
+
+    results: dict[str, BenchResult] = {}
+    with tempfile.TemporaryDirectory(prefix='bench_codegen_') as tmp:
+        tmp_dir = Path(tmp)
+        cases = (file2c_cases(tmp_dir) + parse_makefile_cases(tmp_dir) +
+                 print_config_cases(tmp_dir) + print_enabled_components_cases(tmp_dir))
+        for case in cases:
+            if args.filter in case['name']:
+                print(f'running {case["name"]}', file=sys.stderr)
+                results[case['name']] = run_case(case, args.repeat)
+
+    print_results(results)
+
+    if save_path:
+        save_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+
+    if baseline_path:
+        baseline = json.loads(baseline_path.read_text())
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import math
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+HELP = '''
+Store checkasm benchmark results and compare them across runs.
+
+The run subcommand runs tests/checkasm/checkasm with --bench and stores
+its output, the ingest subcommand stores the output of a previous
+checkasm --bench invocation (text, --csv or --tsv format). Every stored
+run is tagged with the commit and the machine it was produced on.
+
+The compare subcommand compares two sets of runs, each selected by run
+id as #ID (see the list subcommand) or by COMMIT[@MACHINE]. When several
+runs match a selector (e.g. after run --repeat), their samples are
+pooled, and a change is only reported when it exceeds both the relative
+threshold and the measured run to run noise. Runs from different
+machines are compared on their speedup versus C rather than on raw
+cycles.
+
+examples:
+checkasm_bench.py run --repeat 3 --bench=h264*
+checkasm_bench.py ingest --commit 1a2b3c4 --machine builder1 bench.txt
+checkasm_bench.py compare 1a2b3c4@builder1 5d6e7f8@builder1
+checkasm_bench.py compare '#12' '#15'
+'''
+
+logging.basicConfig(format='checkasm_bench|%(levelname)s> %(message)s', level=logging.INFO)
+log = logging.getLogger()
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    commit_id TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    cpu TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    function TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    cycles REAL NOT NULL,
+    speedup REAL
+);
+CREATE INDEX IF NOT EXISTS results_run_id ON results(run_id);
+'''
+
+# text output of print_benchs(): "<function>_<cpu suffix>: <cycles> (<speedup>x)"
+TEXT_BENCH_LINE = re.compile(r'^(\S+):\s+(-?[0-9.]+)\s+\(\s*(-?[0-9.]+)x\)$')
+
+# suffixes of the cpus[] table of tests/checkasm/checkasm.c, plus the C version
+CPU_SUFFIXES = sorted([
+    'c',
+    'aesni', 'altivec', 'armv5te', 'armv6', 'armv6t2', 'armv8', 'avx', 'avx2',
+    'avx512', 'avx512icl', 'clmul', 'crc', 'dotprod', 'fma3', 'fma4', 'i8mm',
+    'lasx', 'lsx', 'misaligned', 'mmi', 'mmx', 'mmxext', 'msa', 'neon', 'power8',
+    'rv_zvbb', 'rvb', 'rvb_b', 'rvi', 'rvv_f32', 'rvv_f64', 'rvv_i32', 'rvv_i64',
+    'simd128', 'sme', 'sse', 'sse2', 'sse3', 'sse4', 'sse42', 'ssse3', 'sve',
+    'sve2', 'vfp', 'vfp3', 'vfp_vm', 'vsx', 'xop',
+], key=len, reverse=True)
+
+
+def split_bench_name(name):
+    """Split "<function>_<cpu suffix>", suffixes may contain '_' too (e.g. rvv_i32)."""
+    for suffix in CPU_SUFFIXES:
+        if name.endswith('_' + suffix):
+            return name[:-len(suffix) - 1], suffix
+    log.warning(f"Unknown CPU suffix in '{name}'")
+    return name.rsplit('_', 1)
+
+
+def parse_bench_output(lines):
+    """Parse checkasm --bench output into (function, variant, cycles, speedup)
+    tuples, speedup is None when not printed (--csv and --tsv output)."""
+    results = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('checkasm:'):
+            continue
+
+        match = TEXT_BENCH_LINE.match(line)
+        if match:
+            function, variant = split_bench_name(match.group(1))
+            speedup = float(match.group(3))
+            results.append((function, variant, float(match.group(2)), speedup or None))
+            continue
+
+        for sep in (',', '\t'):
+            fields = line.split(sep)
+            if len(fields) == 3:
+                try:
+                    results.append((fields[0], fields[1], float(fields[2]), None))
+                except ValueError:
+                    pass
+                break
+    return results
+
+
+def add_speedups(results):
+    """Compute the speedups versus C which were not printed by checkasm."""
+    c_cycles = {function: cycles for function, variant, cycles, _ in results if variant == 'c'}
+    return [
+        (function, variant, cycles,
+         speedup if speedup is not None else
+         c_cycles[function] / cycles if cycles > 0 and function in c_cycles else None)
+        for function, variant, cycles, speedup in results
+    ]
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return result.stdout.strip()
+
+
+def cpu_model():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def open_db(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def store_run(db, args, results):
+    results = add_speedups(results)
+    with db:
+        cursor = db.execute('INSERT INTO runs (timestamp, commit_id, machine, cpu) VALUES (?, ?, ?, ?)',
+                            (time.time(), args.commit or git_commit(), args.machine, args.cpu or cpu_model()))
+        run_id = cursor.lastrowid
+        db.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?)',
+                       [(run_id, *result) for result in results])
+    log.info(f"Stored run #{run_id} with {len(results)} results")
+    return run_id
+
+
+def select_runs(db, selector):
+    """Return the (id, machine) pairs of the runs matching #ID or COMMIT[@MACHINE]."""
+    if selector.startswith('#') and selector[1:].isdigit():
+        return db.execute('SELECT id, machine FROM runs WHERE id = ?', (int(selector[1:]),)).fetchall()
+    commit_id, _, machine = selector.partition('@')
+    query = 'SELECT id, machine FROM runs WHERE commit_id LIKE ?'
+    params = [commit_id + '%']
+    if machine:
+        query += ' AND machine = ?'
+        params.append(machine)
+    return db.execute(query, params).fetchall()
+
+
+def load_samples(db, run_ids, metric):
+    samples = {}
+    placeholders = ','.join('?' * len(run_ids))
+    for function, variant, value in db.execute(
+            f'SELECT function, variant, {metric} FROM results '
+            f'WHERE run_id IN ({placeholders}) AND {metric} IS NOT NULL', run_ids):
+        samples.setdefault((function, variant), []).append(value)
+    return samples
+
+
+def compare_samples(base, new, metric, threshold, sigmas):
+    """Return the relative slowdown of new versus base, or None when it is
+    within the threshold or the run to run noise."""
+    base_value = statistics.median(base)
+    new_value = statistics.median(new)
+    if base_value <= 0 or new_value <= 0:
+        return None
+    # more cycles is slower, a lower speedup versus C is slower
+    if metric == 'cycles':
+        change = new_value / base_value - 1
+    else:
+        change = base_value / new_value - 1
+    if abs(change) <= threshold:
+        return None
+
+    noise = math.hypot(statistics.stdev(base) if len(base) > 1 else 0,
+                       statistics.stdev(new) if len(new) > 1 else 0)
+    if abs(new_value - base_value) <= sigmas * noise:
+        return None
+    return change
+
+
+def cmd_run(db, args):
+    cmd = [args.checkasm, f'--bench={args.bench}' if args.bench else '--bench', '--csv']
+    if args.test:
+        cmd.append(f'--test={args.test}')
+    if args.runs is not None:
+        cmd.append(f'--runs={args.runs}')
+    for _ in range(args.repeat):
+        log.info(f"Running command: {' '.join(cmd)}")
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True)
+        store_run(db, args, parse_bench_output(result.stdout.splitlines()))
+
+
+def cmd_ingest(db, args):
+    for path in args.files:
+        if path == '-':
+            results = parse_bench_output(sys.stdin)
+        else:
+            with open(path) as f:
+                results = parse_bench_output(f)
+        if not results:
+            log.warning(f"No benchmark results found in '{path}'")
+            continue
+        store_run(db, args, results)
+
+
+def cmd_list(db, args):
+    for run_id, timestamp, commit_id, machine, cpu, count in db.execute(
+            'SELECT runs.id, timestamp, commit_id, machine, cpu, COUNT(results.run_id) '
+            'FROM runs LEFT JOIN results ON results.run_id = runs.id GROUP BY runs.id ORDER BY runs.id'):
+        date = time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+        print(f'#{run_id:<5} {date}  {commit_id:<12} {machine:<20} {count:>6}  {cpu}')
+
+
+def cmd_compare(db, args):
+    base_runs = select_runs(db, args.base)
+    new_runs = select_runs(db, args.new)
+    for selector, runs in ((args.base, base_runs), (args.new, new_runs)):
+        if not runs:
+            log.error(f"No runs match '{selector}'")
+            sys.exit(2)
+
+    metric = args.metric
+    if metric == 'auto':
+        machines = {machine for _, machine in base_runs + new_runs}
+        metric = 'cycles' if len(machines) == 1 else 'speedup'
+    log.info(f"Comparing {len(base_runs)} base run(s) with {len(new_runs)} new run(s) on {metric}")
+
+    base = load_samples(db, [run_id for run_id, _ in base_runs], metric)
+    new = load_samples(db, [run_id for run_id, _ in new_runs], metric)
+    regressions = []
+    improvements = []
+    for key in sorted(base.keys() & new.keys()):
+        change = compare_samples(base[key], new[key], metric, args.threshold, args.sigmas)
+        if change is None:
+            continue
+        entry = (key, statistics.median(base[key]), statistics.median(new[key]), change)
+        (regressions if change > 0 else improvements).append(entry)
+
+    def print_entries(title, entries):
+        if not entries:
+            return
+        print(f'{title}:')
+        for (function, variant), base_value, new_value, change in sorted(entries, key=lambda e: -abs(e[3])):
+            print(f'  {function + "_" + variant:<60} {base_value:>10.2f} -> {new_value:>10.2f} ({change:+.1%})')
+
+    print_entries('regressions', regressions)
+    if args.improvements:
+        print_entries('improvements', improvements)
+    for key in sorted(base.keys() - new.keys()):
+        log.warning(f"{key[0]}_{key[1]} is missing from the new runs")
+
+    simd_regressions = [entry for entry in regressions if entry[0][1] != 'c']
+    log.info(f"{len(regressions)} regression(s), {len(simd_regressions)} in SIMD versions, "
+             f"{len(improvements)} improvement(s)")
+    if simd_regressions:
+        sys.exit(1)
+
+
+class Formatter(
+    argparse.ArgumentDefaultsHelpFormatter, argparse.RawDescriptionHelpFormatter
+):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=HELP, formatter_class=Formatter)
+    parser.add_argument('--db', default='checkasm_bench.sqlite', help='specify the results database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_run_info_arguments(p):
+        p.add_argument('--commit', help='specify the commit of the run, instead of the git HEAD')
+        p.add_argument('--machine', default=platform.node(), help='specify the machine name of the run')
+        p.add_argument('--cpu', help='specify the CPU model of the run, instead of the detected one')
+
+    p_run = subparsers.add_parser('run', help='run checkasm benchmarks and store them', formatter_class=Formatter)
+    add_run_info_arguments(p_run)
+    p_run.add_argument('--checkasm', default='tests/checkasm/checkasm', help='specify the checkasm binary')
+    p_run.add_argument('--bench', help='specify the functions to benchmark, as checkasm --bench=PATTERN')
+    p_run.add_argument('--test', help='specify the tests to run, as checkasm --test=PATTERN')
+    p_run.add_argument('--runs', type=int, help='specify the bench runs exponent, as checkasm --runs=N')
+    p_run.add_argument('--repeat', type=int, default=1, help='specify the number of checkasm runs to store')
+
+    p_ingest = subparsers.add_parser('ingest', help='store existing checkasm benchmark output', formatter_class=Formatter)
+    add_run_info_arguments(p_ingest)
+    p_ingest.add_argument('files', nargs='+', help='checkasm output files, - for stdin, one run per file')
+
+    subparsers.add_parser('list', help='list the stored runs', formatter_class=Formatter)
+
+    p_compare = subparsers.add_parser('compare', help='compare two sets of runs', formatter_class=Formatter)
+    p_compare.add_argument('base', help='base runs, as #ID or COMMIT[@MACHINE]')
+    p_compare.add_argument('new', help='new runs, as #ID or COMMIT[@MACHINE]')
+    p_compare.add_argument('--metric', choices=['auto', 'cycles', 'speedup'], default='auto',
+                           help='specify the compared value, auto uses speedup versus C across machines')
+    p_compare.add_argument('--threshold', type=float, default=0.1, help='specify the minimum relative change reported')
+    p_compare.add_argument('--sigmas', type=float, default=2.0,
+                           help='specify the minimum change reported, in standard deviations of the pooled samples')
+    p_compare.add_argument('--improvements', action='store_true', help='also report improvements')
+
+    args = parser.parse_args()
+    db = open_db(args.db)
+
+    match args.command:
+        case 'run':
+            cmd_run(db, args)
+        case 'ingest':
+            cmd_ingest(db, args)
+        case 'list':
+            cmd_list(db, args)
+        case 'compare':
+            cmd_compare(db, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+
+HELP = '''
+Run FATE tests longest first, skipping the ones whose inputs did not
+change since they last passed.
+
+The command must be run from the build directory. The tests are listed
+with make fate-list (or given as arguments) and their fate-run.sh
+command lines are taken from a make dry run. Each test gets a key
+hashing its command line, the ffmpeg/ffprobe binaries and libraries,
+the FATE helper programs, its reference file, its make prerequisites
+(e.g. the generated $(VREF)/$(AREF) inputs) and every file named in its
+command (samples, filter scripts, tools). A test whose key matches
+the one recorded when it last passed is skipped.
+
+Since the keys hash what is on disk, the programs, libraries and other
+build outputs the tests read are brought up to date with make before
+any key is computed, so that a source change is never hidden behind a
+stale binary. If that build fails, no test is skipped.
+
+The remaining tests are run by a single make invocation, with the goals
+ordered by decreasing recorded duration so that make starts the longest
+tests first. Tests without a recorded duration are started first.
+
+Extra make arguments can be passed after the options, for example as in:
+fate_scheduler.py -j 16 -- SAMPLES=/path/to/fate-suite
+'''
+
+logging.basicConfig(format='fate_scheduler|%(levelname)s> %(message)s', level=logging.INFO)
+log = logging.getLogger()
+
+# files whose changes invalidate every test
+GLOBAL_INPUT_PATTERNS = [
+    'ffmpeg*', 'ffprobe*',
+    'libav*/*.so*', 'libsw*/*.so*', 'libav*/*.dylib', 'libsw*/*.dylib', 'libav*/*.dll', 'libsw*/*.dll',
+    'tests/base64*', 'tests/tiny_psnr*', 'tests/tiny_ssim*', 'tests/audiomatch*',
+]
+# built for every test, as the $(FATE) prerequisites in tests/Makefile
+FATE_UTILS = ['base64', 'tiny_psnr', 'tiny_ssim', 'audiomatch']
+# tests checking the source tree rather than the binaries
+NEVER_CACHED = {'fate-source'}
+# generated prerequisites standing for a whole sequence, which fate-run.sh
+# reads through a hardcoded pattern ($raw_src)
+GENERATED_SEQUENCES = {'tests/vsynth1/00.pgm': 'tests/vsynth1/*.pgm'}
+CMD_TOKEN_SEPARATORS = re.compile(r'''[\s'"=,:;|<>()\[\]]+''')
+MAKE_RULE_LINE = re.compile(r'^([^#\s][^:]*?)::?\s*(.*)$')
+MAKE_VARIABLE_VALUE = re.compile(r'^\S+\s*(?:::|[:+?!])?=')
+
+
+class FileHasher:
+    """Hash files, reusing the hashes of files whose size and mtime did not change."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.used = {}
+
+    def hash(self, path):
+        if path in self.used:
+            return self.used[path]
+        try:
+            st = os.stat(path)
+        except OSError:
+            digest = 'missing'
+        else:
+            if os.path.isdir(path):
+                digest = 'dir'
+            else:
+                cached = self.cache.get(path)
+                if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                    digest = cached[2]
+                else:
+                    h = hashlib.sha256()
+                    with open(path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(1 << 20), b''):
+                            h.update(chunk)
+                    digest = h.hexdigest()
+                    self.cache[path] = [st.st_size, st.st_mtime_ns, digest]
+        self.used[path] = digest
+        return digest
+
+
+def list_tests(make_args):
+    result = subprocess.run(['make', '--no-print-directory', 'fate-list'] + make_args,
+                            check=True, stdout=subprocess.PIPE, text=True)
+    return [line for line in result.stdout.split() if line.startswith('fate-')]
+
+
+def fate_suffix(make_args):
+    """Return the FATE_SUFFIX appended by make to the test names, as given
+    on the make command line or in the environment."""
+    suffix = os.environ.get('FATE_SUFFIX', '')
+    for arg in make_args:
+        if arg.startswith('FATE_SUFFIX='):
+            suffix = arg[len('FATE_SUFFIX='):]
+    return suffix
+
+
+def strip_suffix(name, suffix):
+    return name[:-len(suffix)] if suffix and name.endswith(suffix) else name
+
+
+def report_path(test, suffix):
+    return f'tests/data/fate/{test[len("fate-"):]}{suffix}.rep'
+
+
+def fate_run_commands(tests, make_args, suffix):
+    """Return the fate-run.sh arguments of each test, as make would run it."""
+    result = subprocess.run(['make', '-n', '-k', '--no-print-directory'] + make_args + tests,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    commands = {}
+    for line in result.stdout.splitlines():
+        if 'fate-run.sh fate-' not in line:
+            continue
+        try:
+            tokens = shlex.split(line)
+        except ValueError:
+            continue
+        for i, token in enumerate(tokens):
+            if token.endswith('fate-run.sh'):
+                commands[strip_suffix(tokens[i + 1], suffix)] = {'script': token, 'args': tokens[i + 1:]}
+                break
+    return commands
+
+
+def make_prerequisites(tests, make_args):
+    """Return the normal prerequisites of each test which are files, from the
+    make database."""
+    result = subprocess.run(['make', '-p', '-q', '--no-print-directory'] + make_args + ['fate-list'],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    rules = {}
+    phony = set()
+    target = None
+    in_files = False
+    for line in result.stdout.splitlines():
+        if line.startswith('# Files'):
+            in_files = True
+        elif line.startswith('# files hash-table stats'):
+            break
+        elif not in_files:
+            continue
+        elif line.startswith('#  Phony target'):
+            phony.add(target)
+        elif line and not line.startswith(('#', '\t')):
+            match = MAKE_RULE_LINE.match(line)
+            # skip the target-specific variables, e.g. "fate-foo: CMD = ..."
+            if match and not MAKE_VARIABLE_VALUE.match(match.group(2)):
+                target = match.group(1)
+                rules[target] = match.group(2).split('|', 1)[0].split()
+
+    return {
+        test: [p for p in rules.get(test, []) if p not in phony and not p.startswith('fate-')]
+        for test in tests
+    }
+
+
+def input_files(test, command, prerequisites):
+    """Return the files a test reads, besides the global ones."""
+    script = command['script']
+    src_tests_dir = os.path.dirname(script)
+    args = command['args']
+    files = [script, os.path.join(src_tests_dir, 'md5.sh')]
+
+    # as fate-run.sh, the default reference is named after the suffixed test
+    ref = args[6] if len(args) > 6 and args[6] else os.path.join(src_tests_dir, 'ref', 'fate', args[0][len('fate-'):])
+    files.append(ref)
+
+    cmd = args[4] if len(args) > 4 else ''
+    for token in CMD_TOKEN_SEPARATORS.split(cmd):
+        if '/' in token and os.path.isfile(token):
+            files.append(token)
+
+    for path in prerequisites:
+        files.append(path)
+        if path in GENERATED_SEQUENCES:
+            files += sorted(glob.glob(GENERATED_SEQUENCES[path]))
+    return files
+
+
+def test_key(test, command, prerequisites, global_key, hasher):
+    h = hashlib.sha256()
+    h.update(global_key.encode())
+    h.update('\0'.join(command['args']).encode())
+    for path in sorted(set(input_files(test, command, prerequisites))):
+        h.update(f'\0{path}\0{hasher.hash(path)}'.encode())
+    return h.hexdigest()
+
+
+def compute_global_key(hasher):
+    h = hashlib.sha256()
+    for pattern in GLOBAL_INPUT_PATTERNS:
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isfile(path):
+                h.update(f'\0{path}\0{hasher.hash(path)}'.encode())
+    return h.hexdigest()
+
+
+def read_config_mak():
+    config = {}
+    try:
+        with open('ffbuild/config.mak') as f:
+            for line in f:
+                key, sep, value = line.strip().partition('=')
+                if sep and ' ' not in key:
+                    config[key] = value
+    except OSError:
+        pass
+    return config
+
+
+def make_goal(path):
+    """Return path as a make goal relative to the build directory, or None
+    when it is outside of it (e.g. samples or an out of tree source)."""
+    if not os.path.isabs(path):
+        return path
+    try:
+        goal = os.path.relpath(path)
+    except ValueError:
+        return None
+    return None if goal == os.pardir or goal.startswith(os.pardir + os.sep) else goal
+
+
+def build_prerequisites(commands, prerequisites, jobs, make_args):
+    """Bring the programs and build outputs the tests read up to date,
+    return whether it succeeded."""
+    config = read_config_mak()
+    progs_suffix = config.get('PROGSSUF', '') + config.get('EXESUF', '')
+    targets = [f'{prog}{progs_suffix}' for prog in ('ffmpeg', 'ffprobe') if config.get(f'CONFIG_{prog.upper()}') == 'yes']
+    targets += [f'tests/{util}{config.get("HOSTEXESUF", "")}' for util in FATE_UTILS]
+    # helper programs and generated inputs named in the commands, often as
+    # $(TARGET_PATH)/..., files which do not exist yet hash as missing and
+    # never match a cached key
+    paths = [path for test, command in commands.items()
+             for path in input_files(test, command, []) if os.path.isfile(path)]
+    paths += [path for test_paths in prerequisites.values() for path in test_paths]
+    targets += [goal for path in paths if (goal := make_goal(path))]
+    targets = list(dict.fromkeys(targets))
+
+    log.info(f"Building {len(targets)} test prerequisites")
+    result = subprocess.run(['make', '-s', '-k', f'-j{jobs}', '--no-print-directory'] + make_args + targets)
+    return result.returncode == 0
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'tests': {}, 'files': {}}
+
+
+def save_cache(path, cache):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_report(test, suffix):
+    try:
+        with open(report_path(test, suffix)) as f:
+            return f.read().split(':', 2)[1]
+    except (OSError, IndexError):
+        return None
+
+
+def run_tests(tests, jobs, make_args, suffix):
+    """Run the tests with make in the given order, return their durations."""
+    for test in tests:
+        try:
+            os.remove(report_path(test, suffix))
+        except FileNotFoundError:
+            pass
+
+    started = {}
+    cmd = ['make', f'-j{jobs}', '-k', '--no-print-directory'] + make_args + tests
+    log.info(f"Running {len(tests)} tests with {jobs} jobs")
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) as proc:
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            if line.startswith('TEST '):
+                started['fate-' + strip_suffix(line.split()[1], suffix)] = time.time()
+
+    durations = {}
+    for test, start in started.items():
+        try:
+            durations[test] = os.stat(report_path(test, suffix)).st_mtime - start
+        except OSError:
+            pass
+    return durations
+
+
+class Formatter(
+    argparse.ArgumentDefaultsHelpFormatter, argparse.RawDescriptionHelpFormatter
+):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=HELP, formatter_class=Formatter)
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count(), help='specify the number of tests run in parallel')
+    parser.add_argument('--tests', '-t', nargs='+', help='specify the tests to run instead of make fate-list')
+    parser.add_argument('--cache', default='fate_scheduler.json', help='specify the results cache file')
+    parser.add_argument('--force', '-f', action='store_true', help='run all tests, ignoring the cached results')
+    parser.add_argument('make_args', nargs='*', help='specify extra make arguments, e.g. SAMPLES=...')
+
+    args = parser.parse_args()
+
+    tests = args.tests or list_tests(args.make_args)
+    cache = load_cache(args.cache)
+    hasher = FileHasher(cache['files'])
+    suffix = fate_suffix(args.make_args)
+    # results are kept apart for each FATE_SUFFIX, as set by tests/fate.sh
+    cache_tests = cache['tests'].setdefault(suffix, {})
+    commands = fate_run_commands(tests, args.make_args, suffix)
+    prerequisites = make_prerequisites(tests, args.make_args)
+    use_cache = not args.force
+    if not build_prerequisites(commands, prerequisites, args.jobs, args.make_args):
+        log.warning("Building the test prerequisites failed, running all tests")
+        use_cache = False
+    global_key = compute_global_key(hasher)
+
+    skipped = []
+    to_run = []
+    for test in tests:
+        entry = cache_tests.get(test, {})
+        if (use_cache and test not in NEVER_CACHED and test in commands and entry.get('passed') and
+                entry.get('key') == test_key(test, commands[test], prerequisites[test], global_key, hasher)):
+            skipped.append(test)
+        else:
+            to_run.append(test)
+
+    # longest first, unknown durations first of all
+    to_run.sort(key=lambda test: -cache_tests.get(test, {}).get('duration', float('inf')))
+
+    start = time.time()
+    durations = run_tests(to_run, args.jobs, args.make_args, suffix) if to_run else {}
+    wall_time = time.time() - start
+
+    # the inputs generated by the run (e.g. tests/data files) are part of
+    # the key, so recompute it now that they exist
+    hasher.used.clear()
+    global_key = compute_global_key(hasher)
+    failed = []
+    for test in to_run:
+        status = read_report(test, suffix)
+        passed = status == '0'
+        if not passed:
+            failed.append(test)
+        entry = cache_tests.setdefault(test, {})
+        entry['passed'] = passed
+        entry['key'] = test_key(test, commands[test], prerequisites[test], global_key, hasher) if test in commands else None
+        if test in durations:
+            entry['duration'] = durations[test]
+    save_cache(args.cache, cache)
+
+    saved = sum(cache_tests[test].get('duration', 0) for test in skipped)
+    log.info(f"{len(to_run)} tests run in {wall_time:.1f}s, {len(skipped)} skipped, "
+             f"saving {saved:.1f}s of test time")
+    if failed:
+        log.error(f"{len(failed)} tests failed:")
+        for test in failed:
+            log.error(f"  {test}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
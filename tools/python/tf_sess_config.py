@@ -25,21 +25,39 @@ per_process_gpu_memory_fraction = 0.9 # avoid out of memory
 intra_op_parallelism_threads = 2  # default in tensorflow
 inter_op_parallelism_threads = 5  # default in tensorflow
 
-gpu_options = tf.compat.v1.GPUOptions(
-              per_process_gpu_memory_fraction = per_process_gpu_memory_fraction,
-              visible_device_list = visible_device_list,
-              allow_growth = True)
-
-config = tf.compat.v1.ConfigProto(
-         allow_soft_placement = True,
-         log_device_placement = False,
-         intra_op_parallelism_threads = intra_op_parallelism_threads,
-         inter_op_parallelism_threads = inter_op_parallelism_threads,
-         gpu_options = gpu_options)
-
-s = config.SerializeToString()
-# print(list(map(hex, s)))  # print by json if need
-
-print('a serialized protobuf string for TF_SetConfig, note the byte order is in normal order.')
-b = ''.join(format(b,'02x') for b in s)
-print('0x%s' % b) # print by hex format
+
+def gpu_config(intra_op_parallelism_threads = intra_op_parallelism_threads,
+               inter_op_parallelism_threads = inter_op_parallelism_threads):
+    gpu_options = tf.compat.v1.GPUOptions(
+                  per_process_gpu_memory_fraction = per_process_gpu_memory_fraction,
+                  visible_device_list = visible_device_list,
+                  allow_growth = True)
+
+    return tf.compat.v1.ConfigProto(
+           allow_soft_placement = True,
+           log_device_placement = False,
+           intra_op_parallelism_threads = intra_op_parallelism_threads,
+           inter_op_parallelism_threads = inter_op_parallelism_threads,
+           gpu_options = gpu_options)
+
+
+def cpu_config(intra_op_parallelism_threads = intra_op_parallelism_threads,
+               inter_op_parallelism_threads = inter_op_parallelism_threads):
+    return tf.compat.v1.ConfigProto(
+           allow_soft_placement = True,
+           log_device_placement = False,
+           intra_op_parallelism_threads = intra_op_parallelism_threads,
+           inter_op_parallelism_threads = inter_op_parallelism_threads,
+           device_count = {'GPU': 0})
+
+
+def config_to_hex(config):
+    s = config.SerializeToString()
+    # print(list(map(hex, s)))  # print by json if need
+    b = ''.join(format(b,'02x') for b in s)
+    return '0x%s' % b
+
+
+if __name__ == '__main__':
+    print('a serialized protobuf string for TF_SetConfig, note the byte order is in normal order.')
+    print(config_to_hex(gpu_config())) # print by hex format
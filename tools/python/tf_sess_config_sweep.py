@@ -0,0 +1,148 @@
+# Copyright (c) 2026
+#
+# This file is part of FFmpeg.
+#
+# FFmpeg is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# FFmpeg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with FFmpeg; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+# ==============================================================================
+
+# Sweep CPU-only TensorFlow session configs for the dnn filters.
+#
+# Every (intra_op, inter_op) thread count pair of the grid is benchmarked by
+# running the model in a fresh process, since TensorFlow only sets up its
+# thread pools once per process. The model is either a frozen graph (.pb, as
+# loaded by the tensorflow dnn backend) or a SavedModel directory.
+#
+# example:
+# python tf_sess_config_sweep.py --model espcn.pb --input x --output y --shape 1,270,480,1
+
+import argparse
+import concurrent.futures
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import tf_sess_config
+
+
+def power_of_two_grid(limit):
+    grid = []
+    n = 1
+    while n < limit:
+        grid.append(n)
+        n *= 2
+    grid.append(limit)
+    return grid
+
+
+def parse_int_list(s):
+    return [int(v) for v in s.split(',')]
+
+
+def load_model(sess, model):
+    if os.path.isdir(model):
+        tf.compat.v1.saved_model.loader.load(sess, [tf.compat.v1.saved_model.tag_constants.SERVING], model)
+        return
+    graph_def = tf.compat.v1.GraphDef()
+    with open(model, 'rb') as f:
+        graph_def.ParseFromString(f.read())
+    tf.compat.v1.import_graph_def(graph_def, name='')
+
+
+def tensor_name(name):
+    return name if ':' in name else name + ':0'
+
+
+def benchmark(args, intra, inter):
+    config = tf_sess_config.cpu_config(intra_op_parallelism_threads = intra,
+                                       inter_op_parallelism_threads = inter)
+    data = np.random.rand(*args.shape).astype(np.float32)
+    with tf.compat.v1.Graph().as_default() as graph:
+        with tf.compat.v1.Session(graph = graph, config = config) as sess:
+            load_model(sess, args.model)
+            input_tensor = graph.get_tensor_by_name(tensor_name(args.input))
+            output_tensor = graph.get_tensor_by_name(tensor_name(args.output))
+            feed_dict = {input_tensor: data}
+
+            for _ in range(args.warmup):
+                sess.run(output_tensor, feed_dict = feed_dict)
+
+            latencies = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                sess.run(output_tensor, feed_dict = feed_dict)
+                latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        'intra': intra,
+        'inter': inter,
+        'fps': len(latencies) / sum(latencies),
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p95_ms': 1000 * latencies[math.ceil(0.95 * len(latencies)) - 1],
+        'sess_config': tf_sess_config.config_to_hex(config),
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description = 'Benchmark a model under a grid of CPU-only session configs '
+                                     'and print the fastest one as a sess_config value.')
+    parser.add_argument('--model', required = True, help = 'frozen graph (.pb) or SavedModel directory')
+    parser.add_argument('--input', required = True, help = 'input tensor name, as passed to the filter')
+    parser.add_argument('--output', required = True, help = 'output tensor name, as passed to the filter')
+    parser.add_argument('--shape', required = True, type = parse_int_list, help = 'input shape, e.g. 1,270,480,1')
+    parser.add_argument('--intra', type = parse_int_list, default = power_of_two_grid(cpus),
+                        help = 'comma separated intra_op_parallelism_threads values')
+    parser.add_argument('--inter', type = parse_int_list, default = power_of_two_grid(cpus),
+                        help = 'comma separated inter_op_parallelism_threads values')
+    parser.add_argument('--warmup', type = int, default = 3)
+    parser.add_argument('--iterations', type = int, default = 20)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    failures = []
+    for intra, inter in itertools.product(args.intra, args.inter):
+        # one process per config, the thread pools are global to a process,
+        # a crashed process (e.g. out of memory) raises BrokenProcessPool
+        with concurrent.futures.ProcessPoolExecutor(max_workers = 1, mp_context = ctx) as executor:
+            try:
+                results.append(executor.submit(benchmark, args, intra, inter).result())
+            except Exception as e:
+                failures.append((intra, inter, e))
+
+    print('%6s %6s %10s %10s %10s' % ('intra', 'inter', 'fps', 'mean ms', 'p95 ms'))
+    for r in sorted(results, key = lambda r: r['fps'], reverse = True):
+        print('%6d %6d %10.2f %10.2f %10.2f' % (r['intra'], r['inter'], r['fps'], r['mean_ms'], r['p95_ms']))
+    for intra, inter, e in failures:
+        print('%6d %6d     failed: %s' % (intra, inter, e))
+
+    if not results:
+        sys.exit('all configs failed')
+
+    best = max(results, key = lambda r: r['fps'])
+    print('best config: intra_op_parallelism_threads=%d inter_op_parallelism_threads=%d' % (best['intra'], best['inter']))
+    print('a serialized protobuf string for TF_SetConfig, note the byte order is in normal order.')
+    print(best['sess_config'])
+
+
+if __name__ == '__main__':
+    main()
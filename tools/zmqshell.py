@@ -4,21 +4,39 @@ import argparse
 import cmd
 import logging
 import sys
+import time
 import zmq
 
 HELP = '''
-Provide a shell used to send interactive commands to a zmq filter.
+Provide a shell used to send interactive commands to one or more zmq
+filters.
 
-The command assumes there is a running zmq or azmq filter acting as a
-ZMQ server.
+The command assumes there are running zmq or azmq filters acting as
+ZMQ servers. Each of them is registered as a named endpoint, either with
+--bind-address NAME=ADDRESS (repeatable) or with an endpoints file
+containing one "NAME ADDRESS" pair per line.
 
-You can send a command to it, following the syntax:
+You can send a command to all the endpoints, following the syntax:
 TARGET COMMAND [COMMAND_ARGS]
 
+or only to some of them, following the syntax:
+@NAME[,NAME...] TARGET COMMAND [COMMAND_ARGS]
+
+* NAME is the name of a registered endpoint
 * TARGET is the target filter identifier to send the command to
 * COMMAND is the name of the command sent to the filter
 * COMMAND_ARGS is the optional specification of command arguments
 
+Commands are sent to all the selected endpoints at once, and the replies
+are collected until the timeout expires. Endpoints which do not reply in
+time are reported as failed and their socket is recreated, so that they
+do not hold up the following commands.
+
+The registry can be edited from the shell with:
+.endpoints                  list the registered endpoints
+.add NAME ADDRESS           register a new endpoint
+.remove NAME                unregister an endpoint
+
 See the zmq/azmq filters documentation for more details, and the
 zeromq documentation at:
 https://zeromq.org/
@@ -28,22 +46,175 @@ logging.basicConfig(format='zmqshell|%(levelname)s> %(message)s', level=logging.
 log = logging.getLogger()
 
 
+class Endpoint:
+    def __init__(self, context, name, address):
+        self.context = context
+        self.name = name
+        self.address = address
+        self._socket = None
+
+    @property
+    def socket(self):
+        if self._socket is None:
+            self._socket = self.context.socket(zmq.REQ)
+            self._socket.setsockopt(zmq.LINGER, 0)
+            self._socket.connect(self.address)
+        return self._socket
+
+    def reset(self):
+        # a REQ socket which missed its reply cannot send again, drop it
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class EndpointPool:
+    def __init__(self, timeout):
+        self.context = zmq.Context()
+        self.timeout = timeout
+        self.endpoints = {}
+
+    def add(self, name, address):
+        if name in self.endpoints:
+            raise ValueError(f"Endpoint '{name}' is already registered")
+        self.endpoints[name] = Endpoint(self.context, name, address)
+
+    def remove(self, name):
+        self.endpoints.pop(name).reset()
+
+    def send(self, command, names=None):
+        """Send command to the named endpoints (all by default), return
+        a (replies, failures) pair of dicts indexed by endpoint name."""
+        if names is None:
+            names = list(self.endpoints)
+        else:
+            names = list(dict.fromkeys(names))
+        replies = {}
+        failures = {}
+
+        poller = zmq.Poller()
+        pending = {}
+        for name in names:
+            endpoint = self.endpoints.get(name)
+            if endpoint is None:
+                failures[name] = 'unknown endpoint'
+                continue
+            try:
+                endpoint.socket.send_string(command, zmq.NOBLOCK)
+            except zmq.ZMQError as e:
+                failures[name] = str(e)
+                if endpoint.socket not in pending:
+                    endpoint.reset()
+                continue
+            poller.register(endpoint.socket, zmq.POLLIN)
+            pending[endpoint.socket] = endpoint
+
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for socket, _ in poller.poll(max(1, int(remaining * 1000))):
+                endpoint = pending.pop(socket)
+                poller.unregister(socket)
+                replies[endpoint.name] = socket.recv_string()
+
+        for endpoint in pending.values():
+            failures[endpoint.name] = 'timeout'
+            endpoint.reset()
+
+        return replies, failures
+
+
+def reply_succeeded(response):
+    # the filters reply with "ERRCODE ERRMSG[\nRESPONSE]"
+    code = response.split(' ', 1)[0]
+    try:
+        return int(code) == 0
+    except ValueError:
+        return False
+
+
 class LavfiCmd(cmd.Cmd):
     prompt = 'lavfi> '
 
-    def __init__(self, bind_address):
-        context = zmq.Context()
-        self.requester = context.socket(zmq.REQ)
-        self.requester.connect(bind_address)
+    def __init__(self, pool):
+        self.pool = pool
         cmd.Cmd.__init__(self)
 
     def onecmd(self, cmd):
         if cmd == 'EOF':
             sys.exit(0)
+        cmd = cmd.strip()
+        if not cmd:
+            return
+        if cmd.startswith('.'):
+            self.registry_cmd(cmd[1:].split())
+            return
+
+        names = None
+        if cmd.startswith('@'):
+            selector, _, cmd = cmd[1:].partition(' ')
+            names = [name for name in selector.split(',') if name]
+            cmd = cmd.strip()
+            if not names or not cmd:
+                log.error("Invalid command, expected: @NAME[,NAME...] TARGET COMMAND [COMMAND_ARGS]")
+                return
+
         log.info(f"Sending command: {cmd}")
-        self.requester.send_string(cmd)
-        response = self.requester.recv_string()
-        log.info(f"Received response: {response}")
+        replies, failures = self.pool.send(cmd, names)
+        failed = len(failures)
+        for name, response in sorted(replies.items()):
+            if reply_succeeded(response):
+                log.info(f"[{name}] Received response: {response}")
+            else:
+                failed += 1
+                log.warning(f"[{name}] Received response: {response}")
+        for name, error in sorted(failures.items()):
+            log.error(f"[{name}] Failed: {error}")
+
+        total = len(replies) + len(failures)
+        if total > 1:
+            log.info(f"{total - failed}/{total} endpoints succeeded")
+
+    def registry_cmd(self, argv):
+        match argv:
+            case ['endpoints']:
+                for endpoint in self.pool.endpoints.values():
+                    log.info(f"{endpoint.name} {endpoint.address}")
+            case ['add', name, address]:
+                try:
+                    self.pool.add(name, address)
+                except ValueError as e:
+                    log.error(e)
+            case ['remove', name]:
+                try:
+                    self.pool.remove(name)
+                except KeyError:
+                    log.error(f"Unknown endpoint '{name}'")
+            case _:
+                log.error("Unknown shell command, expected one of: .endpoints, .add NAME ADDRESS, .remove NAME")
+
+
+def parse_endpoint(spec):
+    name, sep, address = spec.partition('=')
+    if not sep:
+        return spec, spec
+    return name, address
+
+
+def read_endpoints_file(path):
+    endpoints = []
+    with open(path, 'r') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) != 2:
+                raise ValueError(f"{path}:{lineno}: expected 'NAME ADDRESS', got '{line}'")
+            endpoints.append(tuple(fields))
+    return endpoints
 
 
 class Formatter(
@@ -54,11 +225,32 @@ class Formatter(
 
 def main():
     parser = argparse.ArgumentParser(description=HELP, formatter_class=Formatter)
-    parser.add_argument('--bind-address', '-b', default='tcp://localhost:5555', help='specify bind address used to communicate with ZMQ')
+    parser.add_argument('--bind-address', '-b', action='append',
+                        help='specify [NAME=]ADDRESS bind address used to communicate with ZMQ, '
+                        'can be repeated (default: tcp://localhost:5555)')
+    parser.add_argument('--endpoints-file', '-f', help='specify a file listing one "NAME ADDRESS" endpoint per line')
+    parser.add_argument('--timeout', '-t', type=float, default=2.0, help='specify the time in seconds to wait for replies')
 
     args = parser.parse_args()
+
+    endpoints = [parse_endpoint(spec) for spec in args.bind_address or []]
+    try:
+        if args.endpoints_file:
+            endpoints += read_endpoints_file(args.endpoints_file)
+    except ValueError as e:
+        parser.error(str(e))
+    if not endpoints:
+        endpoints = [parse_endpoint('tcp://localhost:5555')]
+
+    pool = EndpointPool(args.timeout)
+    try:
+        for name, address in endpoints:
+            pool.add(name, address)
+    except ValueError as e:
+        parser.error(str(e))
+
     try:
-        LavfiCmd(args.bind_address).cmdloop('FFmpeg libavfilter interactive shell')
+        LavfiCmd(pool).cmdloop('FFmpeg libavfilter interactive shell')
     except KeyboardInterrupt:
         pass
 